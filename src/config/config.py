@@ -1,4 +1,18 @@
 import os
 
 HDFS_HOST = os.getenv('HDFS_HOST', 'localhost')
-HDFS_PORT = int(os.getenv('HDFS_PORT', 9000))
\ No newline at end of file
+HDFS_PORT = int(os.getenv('HDFS_PORT', 9000))
+QUERY_CACHE_MAX_BYTES = int(os.getenv('QUERY_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+SPILL_DIR = os.getenv('SPILL_DIR', '/tmp/atlas-insights/spill')
+SPILL_MAX_BYTES = int(os.getenv('SPILL_MAX_BYTES', 2 * 1024 * 1024 * 1024))
+DAEMON_HOST = os.getenv('DAEMON_HOST', '127.0.0.1')
+DAEMON_PORT = int(os.getenv('DAEMON_PORT', 8100))
+DAEMON_MAX_WORKERS = int(os.getenv('DAEMON_MAX_WORKERS', 4))
+DAEMON_MAX_JOBS_PER_SOURCE = int(os.getenv('DAEMON_MAX_JOBS_PER_SOURCE', 2))
+DB_POOL_MAX_IDLE = int(os.getenv('DB_POOL_MAX_IDLE', 2))
+WS_MAX_INFLIGHT_PER_CONNECTION = int(os.getenv('WS_MAX_INFLIGHT_PER_CONNECTION', 100))
+WS_MAX_INFLIGHT_GLOBAL = int(os.getenv('WS_MAX_INFLIGHT_GLOBAL', 5000))
+WS_RETRY_AFTER_MS = int(os.getenv('WS_RETRY_AFTER_MS', 500))
+
+WS_PUBLISH_MAX_BATCH = int(os.getenv('WS_PUBLISH_MAX_BATCH', 500))
+ARROW_MIN_BATCH_RECORDS = int(os.getenv('ARROW_MIN_BATCH_RECORDS', 8))
@@ -0,0 +1,296 @@
+import sys
+sys.path.append('/home/kosala/git-repos/atlas-insights/')
+
+import argparse
+import copy
+import importlib
+import json
+import logging
+import queue
+import threading
+import time
+import urllib.request
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from src.config.config import (
+	DAEMON_HOST,
+	DAEMON_MAX_JOBS_PER_SOURCE,
+	DAEMON_MAX_WORKERS,
+	DAEMON_PORT,
+	DB_POOL_MAX_IDLE,
+)
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s - %(message)s')
+
+# source_type -> (module, ingest function); imported on the first job of that type only
+_SOURCE_RUNNERS = {
+	'fs': ('src.ingestion.raw.csv_ingestion', 'ingest_csv_to_parquet'),
+	'rdbms': ('src.ingestion.raw.rdbms_ingestion', 'ingest_rdbms_to_parquet'),
+}
+
+_MAX_JOB_HISTORY = 1000
+_FINISHED_STATUSES = ('succeeded', 'failed')
+
+
+class IngestionDaemon:
+	"""Long-running worker that executes ingestion jobs from a local queue.
+
+	Keeping the process resident means interpreter start-up, pandas/pyarrow
+	imports, the HDFS connection (cached by ``_open_hdfs``) and DB connections
+	(``ConnectionPool``) are paid once instead of once per job.
+	"""
+
+	def __init__(
+		self,
+		max_workers: int = DAEMON_MAX_WORKERS,
+		max_jobs_per_source: int = DAEMON_MAX_JOBS_PER_SOURCE,
+		db_pool_max_idle: int = DB_POOL_MAX_IDLE,
+	):
+		self.max_workers = max_workers
+		self.max_jobs_per_source = max_jobs_per_source
+		self.db_pool_max_idle = db_pool_max_idle
+		# ('job', job_id) from submit, ('done', source_type) from workers, None to stop
+		self._queue: 'queue.Queue[Optional[Tuple[str, str]]]' = queue.Queue()
+		self._jobs: 'OrderedDict[str, Dict]' = OrderedDict()
+		self._jobs_lock = threading.Lock()
+		self._runners: Dict[str, Callable] = {}
+		self._runner_lock = threading.Lock()
+		self._db_pool = None
+		self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ingest')
+		self._dispatcher = threading.Thread(target=self._dispatch, name='ingest-dispatcher', daemon=True)
+
+	def start(self):
+		self._dispatcher.start()
+		logger.info('Ingestion daemon started: max_workers=%d max_jobs_per_source=%d', self.max_workers, self.max_jobs_per_source)
+
+	def stop(self):
+		self._queue.put(None)
+		self._dispatcher.join()
+		self._executor.shutdown(wait=True)
+		if self._db_pool is not None:
+			self._db_pool.close_all()
+		logger.info('Ingestion daemon stopped')
+
+	# ------------------------------------------------------------------
+	# Job submission / status
+	# ------------------------------------------------------------------
+
+	def submit(self, ocs_group: str, dataset: Optional[str] = None) -> Dict:
+		job = {
+			'job_id': uuid.uuid4().hex,
+			'ocs_group': ocs_group,
+			'dataset': dataset,
+			'status': 'queued',
+			'submitted_at': datetime.now().isoformat(),
+			'started_at': None,
+			'finished_at': None,
+			'error': None,
+		}
+		with self._jobs_lock:
+			self._jobs[job['job_id']] = job
+			self._trim_history()
+		self._queue.put(('job', job['job_id']))
+		logger.info('Queued job %s ocs_group=%s dataset=%s', job['job_id'], ocs_group, dataset)
+		return dict(job)
+
+	def _trim_history(self):
+		# only finished jobs are evicted; queued/running jobs must stay visible to _run_job
+		excess = len(self._jobs) - _MAX_JOB_HISTORY
+		if excess <= 0:
+			return
+		finished = [job_id for job_id, job in self._jobs.items() if job['status'] in _FINISHED_STATUSES]
+		for job_id in finished[:excess]:
+			del self._jobs[job_id]
+
+	def get_job(self, job_id: str) -> Optional[Dict]:
+		with self._jobs_lock:
+			job = self._jobs.get(job_id)
+			return dict(job) if job is not None else None
+
+	def list_jobs(self) -> List[Dict]:
+		with self._jobs_lock:
+			return [dict(job) for job in self._jobs.values()]
+
+	# ------------------------------------------------------------------
+	# Execution
+	# ------------------------------------------------------------------
+
+	def _dispatch(self):
+		"""Hand jobs to the executor, holding back those whose source_type has no free slot.
+
+		Slots are tracked here rather than in the workers so a job waiting on a
+		busy source never occupies a pool thread that another source could use.
+		"""
+		running: Dict[str, int] = {}
+		waiting: Dict[str, Deque[Tuple[str, Dict]]] = {}
+		stopping = False
+		while not (stopping and not any(running.values()) and not any(waiting.values())):
+			item = self._queue.get()
+			if item is None:
+				stopping = True
+				continue
+			kind, value = item
+			if kind == 'done':
+				running[value] -= 1
+				if waiting.get(value):
+					job_id, metadata = waiting[value].popleft()
+					running[value] += 1
+					self._executor.submit(self._run_job, job_id, value, metadata)
+				continue
+			prepared = self._prepare_job(value)
+			if prepared is None:
+				continue
+			source_type, metadata = prepared
+			if running.get(source_type, 0) < self.max_jobs_per_source:
+				running[source_type] = running.get(source_type, 0) + 1
+				self._executor.submit(self._run_job, value, source_type, metadata)
+			else:
+				waiting.setdefault(source_type, deque()).append((value, metadata))
+
+	def _prepare_job(self, job_id: str) -> Optional[Tuple[str, Dict]]:
+		"""Resolve the job's source_type and metadata; failed jobs are marked and return None."""
+		job = self.get_job(job_id)
+		if job is None:
+			return None
+		try:
+			from src.utils.common_util_func import load_metadata
+			metadata = load_metadata(job['ocs_group'])
+			source_type = metadata.get('source_type')
+			if source_type not in _SOURCE_RUNNERS:
+				raise ValueError(f'Unsupported source_type for daemon jobs: {source_type}')
+			if job['dataset'] is not None:
+				metadata = _select_dataset(metadata, job['dataset'])
+			return source_type, metadata
+		except Exception as e:
+			self._update_job(job_id, status='failed', finished_at=datetime.now().isoformat(), error=str(e))
+			logger.error('Job %s failed: %s', job_id, e)
+			return None
+
+	def _runner(self, source_type: str) -> Callable:
+		with self._runner_lock:
+			if source_type not in self._runners:
+				if source_type not in _SOURCE_RUNNERS:
+					raise ValueError(f'Unsupported source_type for daemon jobs: {source_type}')
+				module_name, func_name = _SOURCE_RUNNERS[source_type]
+				logger.info('Loading %s runner from %s', source_type, module_name)
+				self._runners[source_type] = getattr(importlib.import_module(module_name), func_name)
+				if source_type == 'rdbms' and self._db_pool is None:
+					from src.providers.rdbms_service import ConnectionPool
+					self._db_pool = ConnectionPool(max_idle=self.db_pool_max_idle)
+			return self._runners[source_type]
+
+	def _update_job(self, job_id: str, **fields):
+		with self._jobs_lock:
+			if job_id in self._jobs:
+				self._jobs[job_id].update(fields)
+
+	def _run_job(self, job_id: str, source_type: str, metadata: Dict):
+		try:
+			runner = self._runner(source_type)
+			self._update_job(job_id, status='running', started_at=datetime.now().isoformat())
+			started = time.monotonic()
+			kwargs = {'pool': self._db_pool} if source_type == 'rdbms' else {}
+			runner(metadata=metadata, ocs_group=self.get_job(job_id)['ocs_group'], **kwargs)
+			self._update_job(job_id, status='succeeded', finished_at=datetime.now().isoformat())
+			logger.info('Job %s succeeded in %.1fs', job_id, time.monotonic() - started)
+		except Exception as e:
+			self._update_job(job_id, status='failed', finished_at=datetime.now().isoformat(), error=str(e))
+			logger.error('Job %s failed: %s', job_id, e)
+		finally:
+			self._queue.put(('done', source_type))
+
+
+def _select_dataset(metadata: Dict, dataset: str) -> Dict:
+	"""Return a copy of metadata restricted to the dataset named ``dataset``."""
+	selected = [
+		ds for ds in metadata.get('dataset_config', [])
+		if ds.get('source', {}).get('name') == dataset
+	]
+	if not selected:
+		raise ValueError(f'Dataset {dataset!r} not found in metadata')
+	metadata = copy.deepcopy(metadata)
+	metadata['dataset_config'] = selected
+	return metadata
+
+# ----------------------------------------------------------------------------
+# HTTP submission
+# ----------------------------------------------------------------------------
+
+def create_app(daemon: IngestionDaemon):
+	from fastapi import FastAPI, HTTPException
+	from pydantic import BaseModel
+
+	app = FastAPI()
+
+	class JobRequest(BaseModel):
+		ocs_group: str
+		dataset: Optional[str] = None
+
+	@app.post("/jobs")
+	def submit_job(request: JobRequest):
+		return daemon.submit(request.ocs_group, request.dataset)
+
+	@app.get("/jobs")
+	def list_jobs():
+		return daemon.list_jobs()
+
+	@app.get("/jobs/{job_id}")
+	def get_job(job_id: str):
+		job = daemon.get_job(job_id)
+		if job is None:
+			raise HTTPException(status_code=404, detail="Job not found")
+		return job
+
+	return app
+
+
+def serve(host: str, port: int, max_workers: int, max_jobs_per_source: int):
+	import uvicorn
+
+	daemon = IngestionDaemon(max_workers=max_workers, max_jobs_per_source=max_jobs_per_source)
+	daemon.start()
+	try:
+		uvicorn.run(create_app(daemon), host=host, port=port)
+	finally:
+		daemon.stop()
+
+
+def submit_job(ocs_group: str, dataset: Optional[str], url: str, wait: bool = False) -> Dict:
+	"""Submit a job to a running daemon, optionally polling until it finishes."""
+	payload = json.dumps({'ocs_group': ocs_group, 'dataset': dataset}).encode('utf-8')
+	req = urllib.request.Request(f'{url}/jobs', data=payload, headers={'Content-Type': 'application/json'})
+	with urllib.request.urlopen(req) as resp:
+		job = json.loads(resp.read())
+	while wait and job['status'] in ('queued', 'running'):
+		time.sleep(1)
+		with urllib.request.urlopen(f"{url}/jobs/{job['job_id']}") as resp:
+			job = json.loads(resp.read())
+	return job
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Resident ingestion daemon and job submission client.')
+	subparsers = parser.add_subparsers(dest='command', required=True)
+
+	serve_parser = subparsers.add_parser('serve', help='Run the daemon with its HTTP job API')
+	serve_parser.add_argument('--host', default=DAEMON_HOST)
+	serve_parser.add_argument('--port', type=int, default=DAEMON_PORT)
+	serve_parser.add_argument('--max-workers', type=int, default=DAEMON_MAX_WORKERS, help='Jobs run concurrently')
+	serve_parser.add_argument('--max-jobs-per-source', type=int, default=DAEMON_MAX_JOBS_PER_SOURCE, help='Concurrent jobs per source_type')
+
+	submit_parser = subparsers.add_parser('submit', help='Submit an ingestion job to a running daemon')
+	submit_parser.add_argument('--ocs', '--ocs-group', dest='ocs_group', required=True, help='OCS group / metadata JSON name (without .json)')
+	submit_parser.add_argument('--dataset', default=None, help='Only ingest this dataset (source name) of the ocs group')
+	submit_parser.add_argument('--url', default=f'http://{DAEMON_HOST}:{DAEMON_PORT}', help='Daemon base URL')
+	submit_parser.add_argument('--wait', action='store_true', help='Poll until the job finishes')
+
+	args = parser.parse_args()
+	if args.command == 'serve':
+		serve(args.host, args.port, args.max_workers, args.max_jobs_per_source)
+	else:
+		print(json.dumps(submit_job(args.ocs_group, args.dataset, args.url, wait=args.wait), indent=2))
@@ -1,11 +1,14 @@
 
 import sys
 sys.path.append('/home/kosala/git-repos/atlas-insights/')
+import pandas as pd
 import pyarrow as pa
 import pyarrow.csv as pv
+import pyarrow.dataset as ds
+import pyarrow.json as pj
 import logging
 from src.config.config import HDFS_HOST, HDFS_PORT
-from src.utils.common_util_func import build_schema, load_metadata
+from src.utils.common_util_func import build_filter_expression, build_schema, load_metadata
 from src.providers.hdfs_service import write_parquet_dataset, write_orc_dataset
 import os
 import json
@@ -14,20 +17,90 @@ import json
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s - %(message)s')
 
+# file_format -> Arrow dataset format; compressed inputs (.gz, .bz2, ...) are
+# decompressed by Arrow based on the file extension
+_FILE_FORMATS = {
+    'csv': 'csv',
+    'csv.gz': 'csv',
+    'json': 'json',
+    'ndjson': 'json',
+    'json.gz': 'json',
+    'ndjson.gz': 'json',
+    'parquet': 'parquet',
+    'orc': 'orc',
+}
+
+
+def _is_temporal(pa_type: pa.DataType) -> bool:
+    return pa.types.is_timestamp(pa_type) or pa.types.is_date(pa_type)
+
+
+def _text_read_schema(schema: pa.schema) -> pa.schema:
+    """Schema used to read text formats: temporal columns stay strings and are parsed per batch."""
+    return pa.schema([
+        pa.field(field.name, pa.string()) if _is_temporal(field.type) else field
+        for field in schema
+    ])
+
+
+def _parse_temporal_batches(batches, schema: pa.schema, row_filter=None):
+    """Parse string temporal columns like ``_rows_to_table`` does; unparseable values become null.
+
+    Arrow's CSV/JSON readers reject a whole file on one bad timestamp (or a
+    ``... UTC`` suffix), so text inputs go through ``pd.to_datetime(errors='coerce')``
+    instead. ``row_filter`` is applied after parsing since it may compare
+    temporal columns.
+    """
+    for batch in batches:
+        table = pa.Table.from_batches([batch])
+        for i, field in enumerate(table.schema):
+            target = schema.field(field.name).type
+            if _is_temporal(target):
+                parsed = pd.to_datetime(table.column(i).to_pandas(), errors='coerce')
+                column = pa.array(parsed, from_pandas=True).cast(target, safe=False)
+                table = table.set_column(i, pa.field(field.name, target), column)
+        if row_filter is not None:
+            table = table.filter(row_filter)
+        yield from table.to_batches()
+
+
+def _build_file_format(file_format: str, schema: pa.schema):
+    """Return the Arrow dataset file format, typing text formats with the metadata schema."""
+    fmt = _FILE_FORMATS.get((file_format or 'csv').lower())
+    if fmt is None:
+        raise ValueError(f'Unsupported file_format: {file_format}')
+    if fmt in ('csv', 'json'):
+        schema = _text_read_schema(schema)
+    if fmt == 'csv':
+        return ds.CsvFileFormat(convert_options=pv.ConvertOptions(column_types=schema))
+    if fmt == 'json':
+        return ds.JsonFileFormat(parse_options=pj.ParseOptions(explicit_schema=schema))
+    return fmt
+
+
 def ingest_csv_to_parquet(
     metadata: dict,
     ocs_group: str,
     hdfs_host: str = HDFS_HOST,
     hdfs_port: int = HDFS_PORT,
+    batch_size: int = 131_072,
 ):
-    """Ingest all datasets defined in metadata from CSV to HDFS Parquet using utility functions."""
-    for ds in metadata.get('dataset_config', []):
-        source = ds.get('source', {})
-        destination = ds.get('destination', {})
+    """Ingest all datasets defined in metadata from files (csv, csv.gz, json/ndjson, parquet, orc) to HDFS ORC.
+
+    Files are scanned as an Arrow dataset: only the `features` columns are
+    read and the optional source `filter` ([column, op, value] triplets) is
+    pushed down into the reader, so columnar inputs skip unneeded column
+    chunks and row groups. Record batches are streamed into the ORC writer.
+    """
+    file_format = metadata.get('source_config', {}).get('file_format', 'csv')
+    for ds_cfg in metadata.get('dataset_config', []):
+        source = ds_cfg.get('source', {})
+        destination = ds_cfg.get('destination', {})
         dataset_name = source.get('name', ocs_group)
-        csv_path = source.get('path')
+        source_path = source.get('path')
         features = source.get('features', [])
         column_names = [f['name'] for f in features]
+        row_filter = source.get('filter', [])
         
         schema = build_schema(features)
         dest_path = destination.get('path')
@@ -35,15 +108,20 @@ def ingest_csv_to_parquet(
             raise ValueError('Destination path not specified in metadata')
 
         logger.info(
-            'Starting CSV ingestion dataset=%s csv=%s columns=%s -> %s', dataset_name, csv_path, len(column_names), dest_path
+            'Starting file ingestion dataset=%s format=%s path=%s columns=%s filter=%s -> %s',
+            dataset_name, file_format, source_path, len(column_names), row_filter, dest_path
         )
 
-        table = pv.read_csv(csv_path)
-        filtered_table = table.select(column_names)
-        # Convert filtered_table to batches of dicts for write_parquet_dataset
-        batch_dicts = [dict(zip(filtered_table.schema.names, row)) for row in zip(*[filtered_table.column(i).to_pylist() for i in range(filtered_table.num_columns)])]
-        # Wrap in a list to match Iterable[List[Dict]]
-        batches = [batch_dicts]
+        file_fmt = _build_file_format(file_format, schema)
+        dataset = ds.dataset(source_path, format=file_fmt)
+        filter_expr = build_filter_expression(row_filter, schema)
+        if isinstance(file_fmt, (ds.CsvFileFormat, ds.JsonFileFormat)):
+            # text inputs have nothing to skip, so filtering after parsing costs no I/O
+            scanner = dataset.scanner(columns=column_names, batch_size=batch_size)
+            batches = _parse_temporal_batches(scanner.to_batches(), schema, filter_expr)
+        else:
+            scanner = dataset.scanner(columns=column_names, filter=filter_expr, batch_size=batch_size)
+            batches = scanner.to_batches()
 
         write_orc_dataset(
             batches=batches,
@@ -65,11 +143,11 @@ def invoke_csv_ingestion(ocs_group: str = 'ecommerce_transactions_fs'):
 if __name__ == "__main__":
     import argparse
 
-    parser = argparse.ArgumentParser(description='Ingest CSV dataset(s) defined by metadata JSON to Parquet on HDFS.')
+    parser = argparse.ArgumentParser(description='Ingest file dataset(s) (csv, csv.gz, json/ndjson, parquet, orc) defined by metadata JSON to ORC on HDFS.')
     parser.add_argument('--ocs', '--ocs-group', dest='ocs_group', default='ecommerce_transactions_fs', help='OCS group / metadata JSON name (without .json)')
     args = parser.parse_args()
 
     metadata_cfg = load_metadata(args.ocs_group)
     ingest_csv_to_parquet(metadata_cfg, args.ocs_group)
-    logger.info('CSV ingestion completed for %s', args.ocs_group)
+    logger.info('File ingestion completed for %s', args.ocs_group)
         
\ No newline at end of file
@@ -4,7 +4,7 @@ import os
 import sys
 import json
 import logging
-from typing import Dict, Iterable, List, Sequence
+from typing import Dict, Iterable, List, Optional, Sequence
 
 sys.path.append('/home/kosala/git-repos/atlas-insights/')  # ensure package root
 
@@ -13,7 +13,7 @@ import pyarrow.parquet as pq
 import pyarrow.fs as pafs
 from src.utils.common_util_func import build_schema, load_metadata
 from src.providers.hdfs_service import write_parquet_dataset, write_orc_dataset
-from src.providers.rdbms_service import connect_db, fetch_batches
+from src.providers.rdbms_service import ConnectionPool, connect_db, fetch_batches
 try:  # optional imports for postgres
 	import psycopg2
 	from psycopg2.extras import RealDictCursor  # type: ignore
@@ -31,45 +31,67 @@ def ingest_rdbms_to_parquet(
 	hdfs_host: str = HDFS_HOST,
 	hdfs_port: int = HDFS_PORT,
 	fetch_size: int = 10_000,
+	pool: Optional[ConnectionPool] = None,
 ) -> None:
-	"""Ingest all datasets defined in metadata from RDBMS to HDFS Parquet."""
+	"""Ingest all datasets defined in metadata from RDBMS to HDFS Parquet.
+
+	When ``pool`` is given the connection is borrowed from it and returned
+	afterwards instead of being opened and closed for this run.
+	"""
 	source_cfg = metadata.get('source_config', {})
+	if pool is not None:
+		with pool.connection(source_cfg) as (conn, norm_db):
+			_ingest_datasets(conn, norm_db, metadata, ocs_group, hdfs_host, hdfs_port, fetch_size)
+		return
+
 	conn, norm_db = connect_db(source_cfg)
 	try:
 		with conn:
-			for ds in metadata.get('dataset_config', []):
-				source = ds.get('source', {})
-				destination = ds.get('destination', {})
-				dataset_name = source.get('name', ocs_group)
-				table_path = source['path']
-				features = source.get('features', [])
-				column_names = [f['name'] for f in features]
-				schema = build_schema(features)
-				dest_path = destination.get('path')
-				if not dest_path:
-					raise ValueError('Destination path not specified in metadata')
-
-				logger.info(
-					'Starting ingestion dataset=%s table=%s columns=%s -> %s', dataset_name, table_path, len(column_names), dest_path
-				)
-
-				batches = fetch_batches(conn, table_path, column_names, db_type=norm_db, fetch_size=fetch_size)
-				write_orc_dataset(
-					batches=batches,
-					schema=schema,
-					dataset_name=dataset_name,
-					destination_path=dest_path,
-					hdfs_host=hdfs_host,
-					hdfs_port=hdfs_port,
-				)
-
-				logger.info('Finished dataset=%s', dataset_name)
+			_ingest_datasets(conn, norm_db, metadata, ocs_group, hdfs_host, hdfs_port, fetch_size)
 	finally:
 		try:
 			conn.close()
 		except Exception:  # pragma: no cover
 			pass
 
+
+def _ingest_datasets(
+	conn,
+	norm_db: str,
+	metadata: Dict,
+	ocs_group: str,
+	hdfs_host: str,
+	hdfs_port: int,
+	fetch_size: int,
+) -> None:
+	for ds in metadata.get('dataset_config', []):
+		source = ds.get('source', {})
+		destination = ds.get('destination', {})
+		dataset_name = source.get('name', ocs_group)
+		table_path = source['path']
+		features = source.get('features', [])
+		column_names = [f['name'] for f in features]
+		schema = build_schema(features)
+		dest_path = destination.get('path')
+		if not dest_path:
+			raise ValueError('Destination path not specified in metadata')
+
+		logger.info(
+			'Starting ingestion dataset=%s table=%s columns=%s -> %s', dataset_name, table_path, len(column_names), dest_path
+		)
+
+		batches = fetch_batches(conn, table_path, column_names, db_type=norm_db, fetch_size=fetch_size)
+		write_orc_dataset(
+			batches=batches,
+			schema=schema,
+			dataset_name=dataset_name,
+			destination_path=dest_path,
+			hdfs_host=hdfs_host,
+			hdfs_port=hdfs_port,
+		)
+
+		logger.info('Finished dataset=%s', dataset_name)
+
 def invoke_rdbms_ingestion(ocs_group: str = 'ecommerce_transactions_rdbms'):
 	metadata = load_metadata(ocs_group)
 	ingest_rdbms_to_parquet(metadata=metadata, ocs_group=ocs_group)
@@ -4,13 +4,17 @@ sys.path.append('/home/kosala/git-repos/atlas-insights/')
 import argparse
 import json
 import logging
-from typing import Dict, List
+import os
+import time
+from typing import Dict, List, Optional
+import pyarrow as pa
 from kafka import KafkaConsumer
-from datetime import datetime
 
-from src.config.config import HDFS_HOST, HDFS_PORT
+from src.config.config import HDFS_HOST, HDFS_PORT, SPILL_DIR, SPILL_MAX_BYTES
 from src.utils.common_util_func import build_schema, load_metadata
 from src.providers.hdfs_service import write_parquet_dataset
+from src.providers.spill_service import SpillBuffer, SpillCapacityError, SpillUploader
+from src.providers.message_codec import SchemaMismatchError, decode_message, records_to_table
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s - %(message)s')
@@ -25,9 +29,25 @@ def consume_and_ingest_to_hdfs(
 	batch_size: int = 1000,
 	hdfs_host: str = HDFS_HOST,
 	hdfs_port: int = HDFS_PORT,
+	spill_dir: Optional[str] = None,
+	spill_max_bytes: int = SPILL_MAX_BYTES,
 ):
 	"""
 	Consume messages from Kafka topic and write batches to HDFS as Parquet.
+
+	Each full batch is appended to a local write-ahead spill (Arrow IPC) and a
+	background uploader drains the spill to HDFS with retry/backoff, so a slow
+	or unavailable HDFS never blocks consumption. Offsets are committed only
+	after the batch is durably spilled; when the spill reaches its byte cap the
+	assigned partitions are paused until the uploader frees space.
+
+	Messages are decoded by their ``atlas-encoding`` header: Arrow record
+	batches are buffered as-is (no per-row Python objects), messages without
+	the header are parsed as JSON. JSON rows whose values do not convert to
+	the schema are logged and dropped when the batch is spilled. An Arrow
+	message whose schema fingerprint does not match this consumer's metadata
+	stops the consumer with ``SchemaMismatchError`` before its offset is
+	committed.
 	
 	Args:
 		metadata: Configuration dictionary with dataset_config
@@ -38,6 +58,9 @@ def consume_and_ingest_to_hdfs(
 		batch_size: Number of messages to accumulate before writing to HDFS
 		hdfs_host: HDFS host
 		hdfs_port: HDFS port
+		spill_dir: Local directory for the write-ahead spill, owned exclusively by
+			this consumer (default ``<SPILL_DIR>/<ocs_group>/<dataset name>``)
+		spill_max_bytes: Cap on local disk used by the spill
 	"""
 	# Get dataset configuration from metadata
 	dataset_configs = metadata.get('dataset_config', [])
@@ -62,72 +85,133 @@ def consume_and_ingest_to_hdfs(
 		'Starting Kafka consumer: topic=%s group_id=%s batch_size=%d -> %s',
 		topic, group_id, batch_size, dest_path
 	)
+	# One spill directory per consumer; fails fast if another consumer holds it
+	spill = SpillBuffer(
+		spill_dir=spill_dir or os.path.join(SPILL_DIR, ocs_group, dataset_name),
+		max_bytes=spill_max_bytes,
+	)
 	# Initialize Kafka consumer
 	consumer = KafkaConsumer(
 		topic,
 		bootstrap_servers=bootstrap_servers,
 		group_id=group_id,
 		auto_offset_reset='earliest',
-		enable_auto_commit=True,
-		value_deserializer=lambda m: json.loads(m.decode('utf-8'))
+		enable_auto_commit=False,
 	)
+
+	def upload_segment(table, segment_name: str):
+		write_parquet_dataset(
+			batches=[table],
+			schema=schema,
+			dataset_name=segment_name,
+			destination_path=dest_path,
+			hdfs_host=hdfs_host,
+			hdfs_port=hdfs_port,
+		)
+
+	uploader = SpillUploader(spill, upload_segment)
+	uploader.start()
+
+	def spill_and_commit(rows: List[Dict], record_batches: List[pa.RecordBatch]):
+		# buffers are cleared only once spilled, so a failed spill is retried with the next batch
+		pieces = [pa.Table.from_batches(record_batches, schema=schema)] if record_batches else []
+		if rows:
+			row_table, invalid = records_to_table(rows, schema)
+			if invalid:
+				# a bad value would fail every retry of this batch; drop the row, not the batch
+				logger.warning('Dropping %d record(s) that do not match the schema, e.g. %s', len(invalid), next(iter(invalid.values())))
+			if row_table.num_rows:
+				pieces.append(row_table)
+		if not pieces:
+			consumer.commit()
+			return
+		table = pa.concat_tables(pieces)
+		while True:
+			try:
+				spill.append(table, name_prefix=dataset_name)
+				break
+			except SpillCapacityError as e:
+				logger.warning('%s; pausing consumption until the uploader catches up', e)
+				partitions = consumer.assignment()
+				consumer.pause(*partitions)
+				consumer.poll(timeout_ms=1000)  # keep group membership alive while paused
+				time.sleep(1)
+				consumer.resume(*partitions)
+		logger.info('Spilled batch of %d records; %s', table.num_rows, spill.metrics())
+		rows.clear()
+		record_batches.clear()
+		consumer.commit()
 	
 	batch_buffer: List[Dict] = []
+	arrow_buffer: List[pa.RecordBatch] = []
+	arrow_rows = 0
 	message_count = 0
+	schema_mismatch = False
 	
 	try:
 		for message in consumer:
 			try:
-				# Parse message value (already deserialized as JSON)
-				record = message.value
-				# Validate and filter columns based on schema
-				filtered_record = {}
-				for col in column_names:
-					if col in record:
-						filtered_record[col] = record[col]
-					else:
-						filtered_record[col] = None  # Handle missing columns
-				
-				batch_buffer.append(filtered_record)
-				message_count += 1
-				
-				# Write batch to HDFS when buffer reaches batch_size
-				if len(batch_buffer) >= batch_size:
-					logger.info('Writing batch of %d records to HDFS', len(batch_buffer))
-					write_parquet_dataset(
-						batches=[batch_buffer],
-						schema=schema,
-						dataset_name=f"{dataset_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-						destination_path=dest_path,
-						hdfs_host=hdfs_host,
-						hdfs_port=hdfs_port,
-					)
-					batch_buffer.clear()
-					logger.info('Total messages processed: %d', message_count)
+				# Decode message value (JSON dict or Arrow record batch)
+				record = decode_message(message.value, message.headers, schema)
+				if isinstance(record, pa.RecordBatch):
+					arrow_buffer.append(record)
+					arrow_rows += record.num_rows
+					message_count += record.num_rows
+				else:
+					# Validate and filter columns based on schema
+					filtered_record = {}
+					for col in column_names:
+						if col in record:
+							filtered_record[col] = record[col]
+						else:
+							filtered_record[col] = None  # Handle missing columns
 					
+					batch_buffer.append(filtered_record)
+					message_count += 1
+				
+			except SchemaMismatchError as e:
+				# skipping would commit past a whole publisher micro-batch; stop uncommitted instead
+				logger.critical(
+					'Stopping consumer at %s[%s] offset %s, publisher and consumer metadata differ: %s',
+					message.topic, message.partition, message.offset, e
+				)
+				schema_mismatch = True
+				raise
 			except json.JSONDecodeError as e:
 				logger.error('Failed to parse message: %s', e)
 				continue
 			except Exception as e:
 				logger.error('Error processing message: %s', e)
 				continue
+
+			# Spill batch for upload to HDFS when buffer reaches batch_size
+			if len(batch_buffer) + arrow_rows >= batch_size:
+				try:
+					spill_and_commit(batch_buffer, arrow_buffer)
+				except OSError as e:
+					# local disk trouble: keep the buffer and retry with the next message
+					logger.error('Spill failed, will retry: %s', e)
+					continue
+				arrow_rows = 0
+				logger.info('Total messages processed: %d', message_count)
 				
 	except KeyboardInterrupt:
 		logger.info('Consumer stopped by user')
 	finally:
-		# Write any remaining records in buffer
-		if batch_buffer:
-			logger.info('Writing final batch of %d records to HDFS', len(batch_buffer))
-			write_parquet_dataset(
-				batches=[batch_buffer],
-				schema=schema,
-				dataset_name=f"{dataset_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-				destination_path=dest_path,
-				hdfs_host=hdfs_host,
-				hdfs_port=hdfs_port,
-			)
-		consumer.close()
-		logger.info('Consumer closed. Total messages processed: %d', message_count)
+		try:
+			# Write any remaining records in buffer. After a schema mismatch the consumer
+			# position is past the bad message, so the buffer is left to be re-read instead.
+			if schema_mismatch:
+				logger.warning('Leaving %d buffered record(s) uncommitted for the next run', len(batch_buffer) + arrow_rows)
+			elif batch_buffer or arrow_buffer:
+				logger.info('Spilling final batch of %d records', len(batch_buffer) + arrow_rows)
+				spill_and_commit(batch_buffer, arrow_buffer)
+		finally:
+			# release the spill directory lock and group membership even if the last spill failed
+			uploader.stop()
+			spill.close()
+			consumer.close()
+			logger.info('Consumer closed. Total messages processed: %d', message_count)
 
 
 def invoke_streaming_ingestion(
@@ -186,6 +270,17 @@ if __name__ == "__main__":
 		default=1000,
 		help='Number of messages to accumulate before writing to HDFS'
 	)
+	parser.add_argument(
+		'--spill-dir',
+		default=None,
+		help='Local directory for the write-ahead spill drained to HDFS (default: <SPILL_DIR>/<ocs group>/<dataset>)'
+	)
+	parser.add_argument(
+		'--spill-max-bytes',
+		type=int,
+		default=SPILL_MAX_BYTES,
+		help='Cap on local disk used by the spill; consumption pauses when reached'
+	)
 	
 	args = parser.parse_args()
 	
@@ -197,6 +292,8 @@ if __name__ == "__main__":
 		bootstrap_servers=args.bootstrap_servers,
 		group_id=args.group_id,
 		batch_size=args.batch_size,
+		spill_dir=args.spill_dir,
+		spill_max_bytes=args.spill_max_bytes,
 	)
 
 # Example usage:
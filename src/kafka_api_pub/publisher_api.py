@@ -1,49 +1,279 @@
 import asyncio
 import json
 import logging
+import threading
 from kafka import KafkaProducer
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Query
 from fastapi.responses import HTMLResponse
 
+from src.config.config import (
+    WS_MAX_INFLIGHT_GLOBAL,
+    WS_MAX_INFLIGHT_PER_CONNECTION,
+    WS_PUBLISH_MAX_BATCH,
+    WS_RETRY_AFTER_MS,
+)
+from src.providers.message_codec import (
+    ENCODING_ARROW,
+    ENCODING_JSON,
+    encode_records,
+    get_message_encoding,
+    records_to_table,
+)
+from src.utils.common_util_func import build_schema
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
+# Flow control counters, reported by GET /metrics
+_publisher_stats = {
+    "active_connections": 0,
+    "inflight_global": 0,
+    "queue_depths": {},
+    "published": 0,
+    "publish_failures": 0,
+    "shed_connection_limit": 0,
+    "shed_global_limit": 0,
+}
+
+_producer = None
+_producer_lock = threading.Lock()
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(
     websocket: WebSocket,
     ocs_group: str = Query(None)
 ):
+    """Validate and publish events with credit-based flow control.
+
+    On connect the server sends ``{"status": "credit", "credits": N}``: the
+    client may have up to N messages awaiting an ack. Every ack carries the
+    current credit count. Messages beyond the per-connection or global
+    in-flight limit are shed with ``{"status": "rejected", "retry_after_ms": ...}``.
+
+    Every ack, error and rejection carries the ``id`` of the message it
+    answers: the message's own ``id`` (or ``seq``) field when it is a JSON
+    object with one, otherwise its 1-based receive position on this
+    connection. Rejections arrive interleaved with acks of earlier messages,
+    so clients match on ``id`` to know what to resend.
+
+    Queued messages are published in micro-batches of up to
+    ``WS_PUBLISH_MAX_BATCH``, encoded per the ocs group's ``message_encoding``.
+    """
     await websocket.accept()
     try:
+        metadata_config = load_metadata_config(ocs_group)
+        encoding = get_message_encoding(metadata_config)
+    except (OSError, ValueError):
+        logger.error(f"Invalid or missing metadata config for ocs_group {ocs_group}")
+        await websocket.send_text(json.dumps(
+            {"status": "error", "message": f"Unknown ocs_group: {ocs_group}"}))
+        await websocket.close(code=1008)
+        return
+
+    conn_id = id(websocket)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=WS_MAX_INFLIGHT_PER_CONNECTION)
+    send_lock = asyncio.Lock()
+    inflight = {"count": 0}  # queued + being published for this connection
+    received = 0  # receive position, the fallback message id
+
+    async def send(payload: dict):
+        async with send_lock:
+            await websocket.send_text(json.dumps(payload))
+
+    def credits() -> int:
+        return WS_MAX_INFLIGHT_PER_CONNECTION - inflight["count"]
+
+    async def publish_worker():
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                items = [await queue.get()]
+                while len(items) < WS_PUBLISH_MAX_BATCH and not queue.empty():
+                    items.append(queue.get_nowait())
+                try:
+                    responses = await loop.run_in_executor(
+                        None, process_messages, items, metadata_config, ocs_group, encoding)
+                finally:
+                    inflight["count"] -= len(items)
+                    _publisher_stats["inflight_global"] -= len(items)
+                    _publisher_stats["queue_depths"][conn_id] = queue.qsize()
+                for response in responses:
+                    if response["status"] == "processed":
+                        _publisher_stats["published"] += 1
+                    elif "retry_after_ms" in response:
+                        _publisher_stats["publish_failures"] += 1
+                    response["credits"] = credits()
+                    await send(response)
+        except Exception as e:
+            # without a worker nothing would ever be acked; close so the client reconnects
+            logger.error(f"Publish worker for connection {conn_id} failed: {e}")
+            try:
+                await websocket.close(code=1011)
+            except Exception:
+                pass
+
+    _publisher_stats["active_connections"] += 1
+    _publisher_stats["queue_depths"][conn_id] = 0
+    worker = asyncio.create_task(publish_worker())
+    try:
+        await send({"status": "credit", "credits": credits()})
         while True:
             data = await websocket.receive_text()
-            try:
-                json_data = json.loads(data)
-                # validate the data
-                metadata_config = {}
-                meta_data_path = f'src/config/{ocs_group}.json'
-                with open(meta_data_path, 'r') as f:
-                    metadata_config = json.load(f)
-                dataset_config = metadata_config.get('dataset_config', [{}])
-                for config in dataset_config:
-                    source_config = config.get('source', {})\
-                                          .get('features', [])
-                    validated_data = validate_data(
-                        json_data, source_config)
-                    logger.info(f"Validated data: {validated_data}")
-                    # publish to Kafka
-                    publish_to_kafka(validated_data, topic=ocs_group)
-
-                response = {"status": "processed", "received": json_data}
-            except json.JSONDecodeError:
-                logger.debug("Received invalid JSON")
-                response = {"status": "error", "message": "Invalid JSON"}
-            await websocket.send_text(json.dumps(response))
+            received += 1
+            if inflight["count"] >= WS_MAX_INFLIGHT_PER_CONNECTION:
+                _publisher_stats["shed_connection_limit"] += 1
+                await send(shed_response(
+                    "connection in-flight limit reached", credits(), message_id(data, received)))
+                continue
+            if _publisher_stats["inflight_global"] >= WS_MAX_INFLIGHT_GLOBAL:
+                _publisher_stats["shed_global_limit"] += 1
+                await send(shed_response(
+                    "server in-flight limit reached", credits(), message_id(data, received)))
+                continue
+            inflight["count"] += 1
+            _publisher_stats["inflight_global"] += 1
+            queue.put_nowait((received, data))
+            _publisher_stats["queue_depths"][conn_id] = queue.qsize()
     except WebSocketDisconnect:
         logger.info("Client disconnected")
-        
+    except RuntimeError:
+        # the socket was closed by the publish worker
+        logger.info("Connection closed by server")
+    finally:
+        worker.cancel()
+        try:
+            await worker
+        except (asyncio.CancelledError, WebSocketDisconnect, RuntimeError):
+            pass
+        # release the global slots still held by messages the worker never finished
+        _publisher_stats["inflight_global"] -= inflight["count"]
+        _publisher_stats["queue_depths"].pop(conn_id, None)
+        _publisher_stats["active_connections"] -= 1
+
+
+@app.get("/metrics")
+def metrics():
+    queue_depths = list(_publisher_stats["queue_depths"].values())
+    return {
+        "active_connections": _publisher_stats["active_connections"],
+        "inflight_global": _publisher_stats["inflight_global"],
+        "max_inflight_global": WS_MAX_INFLIGHT_GLOBAL,
+        "max_inflight_per_connection": WS_MAX_INFLIGHT_PER_CONNECTION,
+        "queue_depth_total": sum(queue_depths),
+        "queue_depth_max": max(queue_depths, default=0),
+        "published": _publisher_stats["published"],
+        "publish_failures": _publisher_stats["publish_failures"],
+        "shed_connection_limit": _publisher_stats["shed_connection_limit"],
+        "shed_global_limit": _publisher_stats["shed_global_limit"],
+    }
+
+
+def shed_response(reason: str, credits: int, msg_id=None) -> dict:
+    return {
+        "status": "rejected",
+        "id": msg_id,
+        "message": reason,
+        "retry_after_ms": WS_RETRY_AFTER_MS,
+        "credits": credits,
+    }
+
+
+def _client_id(payload):
+    if isinstance(payload, dict):
+        return payload.get("id", payload.get("seq"))
+    return None
+
+
+def message_id(data: str, seq: int):
+    """Return the client's ``id``/``seq`` of a raw message, falling back to its receive position."""
+    try:
+        client_id = _client_id(json.loads(data))
+    except ValueError:
+        client_id = None
+    return seq if client_id is None else client_id
+
+
+def load_metadata_config(ocs_group: str) -> dict:
+    meta_data_path = f'src/config/{ocs_group}.json'
+    with open(meta_data_path, 'r') as f:
+        return json.load(f)
+
+
+def process_messages(
+    items: list,
+    metadata_config: dict,
+    ocs_group: str,
+    encoding: str = ENCODING_JSON
+) -> list:
+    """Validate raw messages against the metadata and publish them to Kafka.
+
+    ``items`` are ``(receive position, raw message)`` pairs. Returns one
+    response per message, in order, each tagged with the message ``id``.
+    """
+    dataset_config = metadata_config.get('dataset_config', [{}])
+    features = dataset_config[0].get('source', {}).get('features', [])
+    responses = []
+    validated_records = []
+    record_owners = []  # response index of each validated record
+    accepted = []
+    msg_ids = []
+    for seq, data in items:
+        msg_ids.append(seq)
+        try:
+            json_data = json.loads(data)
+            if _client_id(json_data) is not None:
+                msg_ids[-1] = _client_id(json_data)
+            if not isinstance(json_data, dict):
+                responses.append({"status": "error", "message": "Message must be a JSON object"})
+                continue
+            # validate the data
+            for config in dataset_config:
+                source_config = config.get('source', {})\
+                                      .get('features', [])
+                validated_data = validate_data(
+                    json_data, source_config)
+                logger.debug(f"Validated data: {validated_data}")
+                validated_records.append(validated_data)
+                record_owners.append(len(responses))
+            accepted.append(len(responses))
+            responses.append({"status": "processed", "received": json_data})
+        except json.JSONDecodeError:
+            logger.debug("Received invalid JSON")
+            responses.append({"status": "error", "message": "Invalid JSON"})
+        except KeyError as e:
+            responses.append({"status": "error", "message": f"Missing key: {e}"})
+        except Exception as e:
+            # one malformed message must not fail the rest of the micro-batch
+            logger.error(f"Error validating message: {e}")
+            responses.append({"status": "error", "message": f"Invalid message: {e}"})
+
+    # arrow batches are converted here once, so a bad value is rejected on its own
+    # instead of failing the whole batch; the table is then reused for encoding
+    table, invalid = None, {}
+    if encoding == ENCODING_ARROW and validated_records:
+        table, invalid = records_to_table(validated_records, build_schema(features))
+    if invalid:
+        for i, error in invalid.items():
+            responses[record_owners[i]] = {"status": "error", "message": f"Invalid field value: {error}"}
+        rejected = {record_owners[i] for i in invalid}
+        validated_records = [record for record, owner in zip(validated_records, record_owners)
+                             if owner not in rejected]
+        accepted = [i for i in accepted if i not in rejected]
+
+    # publish to Kafka
+    if validated_records and not publish_records(
+            validated_records, topic=ocs_group, features=features, encoding=encoding, table=table):
+        for i in accepted:
+            responses[i] = {"status": "error", "message": "Publish failed",
+                            "retry_after_ms": WS_RETRY_AFTER_MS}
+    for response, msg_id in zip(responses, msg_ids):
+        response["id"] = msg_id
+    return responses
+
+
 def validate_data(data: dict, meta_data_keys: list) -> dict:
     output = {}
     try:
@@ -54,21 +284,46 @@ def validate_data(data: dict, meta_data_keys: list) -> dict:
         raise e
     return output
 
-def publish_to_kafka(data: dict, topic: str) -> bool:
-    """Publish data to Kafka topic using kafka-python."""
+
+def get_producer() -> KafkaProducer:
+    """Return the process-wide producer; reusing it lets sends share batches and connections."""
+    global _producer
+    # process_messages runs on executor threads, so creation must not race
+    with _producer_lock:
+        if _producer is None:
+            # values are pre-encoded by message_codec (json or arrow)
+            _producer = KafkaProducer(bootstrap_servers=["localhost:9092"])
+        return _producer
+
+
+def publish_records(
+    records: list,
+    topic: str,
+    features: list,
+    encoding: str = ENCODING_JSON,
+    table=None
+) -> bool:
+    """Encode validated records and publish them to Kafka topic using kafka-python.
+
+    ``table`` optionally carries ``records`` already converted to Arrow.
+    """
     output = True
     try:
-        producer = KafkaProducer(
-            bootstrap_servers=["localhost:9092"],
-            value_serializer=lambda v: json.dumps(v).encode('utf-8')
-        )
-        logger.info(f"Publishing to Kafka topic {topic}: {data}")
-        producer.send(topic, value=data)
-        producer.flush()
-        producer.close()
-        
+        producer = get_producer()
+        messages = encode_records(records, build_schema(features), encoding, table=table)
+        logger.debug(f"Publishing {len(records)} record(s) as {len(messages)} {encoding} message(s) to Kafka topic {topic}")
+        futures = [producer.send(topic, value=value, headers=headers)
+                   for value, headers in messages]
+        # wait for the broker acks so the in-flight limits reflect real Kafka latency
+        for future in futures:
+            future.get(timeout=10)
+
     except Exception as e:
         logger.error(f"Error publishing to Kafka topic {topic}: {e}")
-        producer.close()
         output = False
-    return output
\ No newline at end of file
+    return output
+
+
+def publish_to_kafka(data: dict, topic: str) -> bool:
+    """Publish a single record to Kafka topic as JSON."""
+    return publish_records([data], topic, features=[], encoding=ENCODING_JSON)
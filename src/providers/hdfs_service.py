@@ -1,11 +1,13 @@
+import functools
 import logging
 import pyarrow as pa
 import pyarrow.parquet as pq
 import pyarrow.fs as pafs
 import datetime
 import pandas as pd
-from typing import Dict, Iterable, List
+from typing import Dict, Iterable, List, Union
 from pyarrow import orc
+from src.providers.manifest_service import ColumnStatsCollector, update_manifest
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s - %(message)s')
@@ -14,7 +16,9 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name
 # Parquet Writing (HDFS)
 # ----------------------------------------------------------------------------
 
+@functools.lru_cache(maxsize=None)
 def _open_hdfs(host: str, port: int):
+	"""Connect once per (host, port); the JVM/libhdfs bring-up is the expensive part."""
 	return pafs.HadoopFileSystem(host=host, port=port)
 
 
@@ -27,82 +31,126 @@ def _ensure_hdfs_dir(hdfs: pafs.HadoopFileSystem, path: str):
 		pass
 
 def write_parquet_dataset(
-	batches: Iterable[List[Dict]],
+	batches: Iterable[Union[List[Dict], pa.Table]],
 	schema: pa.schema,
 	dataset_name: str,
 	destination_path: str,
 	hdfs_host: str,
 	hdfs_port: int,
+	write_manifest: bool = True,
 ):
 	hdfs = _open_hdfs(hdfs_host, hdfs_port)
 	_ensure_hdfs_dir(hdfs, destination_path)
 	file_path = f"{destination_path.rstrip('/')}/{dataset_name}.parquet"
 	logger.info("Writing Parquet to HDFS: %s", file_path)
 
+	stats = ColumnStatsCollector(schema) if write_manifest else None
 	with hdfs.open_output_stream(file_path) as out_stream:
 		writer = None
 		try:
 			for batch_rows in batches:
 				if not batch_rows:
 					continue
-				table = _rows_to_table(batch_rows, schema)
+				table = _to_table(batch_rows, schema)
+				if stats is not None:
+					stats.update(table)
 				if writer is None:
 					writer = pq.ParquetWriter(out_stream, table.schema)
 				writer.write_table(table)
+			if writer is None:  # nothing matched: still leave a readable file with the schema
+				writer = pq.ParquetWriter(out_stream, schema)
 		finally:
 			if writer is not None:
 				writer.close()
 
 	logger.info("Completed Parquet write: %s", file_path)
+	if stats is not None:
+		_write_file_stats(hdfs, destination_path, file_path, stats)
  
 def write_orc_dataset(
-	batches: Iterable[List[Dict]],
+	batches: Iterable[Union[List[Dict], pa.Table]],
 	schema: pa.schema,
 	dataset_name: str,
 	destination_path: str,
 	hdfs_host: str,
 	hdfs_port: int,
+	write_manifest: bool = True,
 ):
 	hdfs = _open_hdfs(hdfs_host, hdfs_port)
 	_ensure_hdfs_dir(hdfs, destination_path)
 	file_path = f"{destination_path.rstrip('/')}/{dataset_name}.orc"
 	logger.info("Writing ORC to HDFS: %s", file_path)
 
+	stats = ColumnStatsCollector(schema) if write_manifest else None
 	with hdfs.open_output_stream(file_path) as out_stream:
 		writer = None
 		try:
 			for batch_rows in batches:
 				if not batch_rows:
 					continue
-				table = _rows_to_table(batch_rows, schema)
+				table = _to_table(batch_rows, schema)
+				if stats is not None:
+					stats.update(table)
 				if writer is None:
 					writer = orc.ORCWriter(out_stream)
 				writer.write(table)
+			if writer is None:  # nothing matched: still leave a readable file with the schema
+				writer = orc.ORCWriter(out_stream)
+				writer.write(schema.empty_table())
 		finally:
 			if writer is not None:
 				writer.close()
 
 	logger.info("Completed ORC write: %s", file_path)
- 
+	if stats is not None:
+		_write_file_stats(hdfs, destination_path, file_path, stats)
+
+def _write_file_stats(
+	hdfs: pafs.HadoopFileSystem,
+	destination_path: str,
+	file_path: str,
+	stats: ColumnStatsCollector,
+):
+	"""Record column stats for a freshly written file; never fails the data write."""
+	file_name = file_path.rsplit('/', 1)[-1]
+	try:
+		entry = stats.to_entry()
+		entry['file_size'] = hdfs.get_file_info(file_path).size
+		update_manifest(hdfs, destination_path, file_name, entry)
+	except Exception as e:
+		logger.warning("Could not update manifest for %s: %s", file_path, e)
+
+def _to_table(batch, schema: pa.schema) -> pa.Table:
+	"""Accept either a list of row dicts or an Arrow table/record batch."""
+	if isinstance(batch, pa.RecordBatch):
+		batch = pa.Table.from_batches([batch])
+	if isinstance(batch, pa.Table):
+		return batch.select(schema.names).cast(schema)
+	return _rows_to_table(batch, schema)
+
 def _rows_to_table(rows: List[Dict], schema: pa.schema) -> pa.Table:
 	"""Reorganize rows by column preserving order of schema fields"""
 	try:
-		columns = {}
-		for field in schema:
-			values = []
-			for r in rows:
-				values.append(r.get(field.name))
-			
-			# Handle timestamp conversion from string
-			if pa.types.is_timestamp(field.type):
-				# Convert string datetime to pandas datetime, then to pyarrow
-				values = pd.to_datetime(values, errors='coerce')
-				array = pa.array(values, type=field.type)
-			else:
-				array = pa.array(values, type=field.type, from_pandas=True)
-			
-			columns[field.name] = array
+		return _convert_rows(rows, schema)
 	except Exception as e:
 		logger.error(f"Error converting rows to table: {e}")
 		raise e
+
+def _convert_rows(rows: List[Dict], schema: pa.schema) -> pa.Table:
+	"""``_rows_to_table`` without the error log, for callers that expect bad rows."""
+	columns = {}
+	for field in schema:
+		values = []
+		for r in rows:
+			values.append(r.get(field.name))
+		
+		# Handle timestamp conversion from string
+		if pa.types.is_timestamp(field.type):
+			# Convert string datetime to pandas datetime, then to pyarrow
+			values = pd.to_datetime(values, errors='coerce')
+			array = pa.array(values, type=field.type)
+		else:
+			array = pa.array(values, type=field.type, from_pandas=True)
+		
+		columns[field.name] = array
 	return pa.table(columns, schema=schema)
\ No newline at end of file
@@ -0,0 +1,333 @@
+import base64
+import datetime
+import json
+import logging
+import math
+import uuid
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.fs as pafs
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s - %(message)s')
+
+MANIFEST_FILE_NAME = '_manifest.json'  # leading '_' keeps Hive / Arrow datasets from reading it as data
+STATS_DIR_NAME = '_stats'  # per-file sidecars awaiting compaction
+MANIFEST_VERSION = 1
+MANIFEST_COMPACT_THRESHOLD = 64
+DATA_FILE_SUFFIXES = ('.orc', '.parquet')
+
+# ----------------------------------------------------------------------------
+# Approximate distinct counts (HyperLogLog)
+# ----------------------------------------------------------------------------
+
+class _HyperLogLog:
+	"""Mergeable HyperLogLog sketch; ~3% standard error at the default precision."""
+
+	def __init__(self, precision: int = 10, registers: Optional[np.ndarray] = None):
+		self.precision = precision
+		self.num_registers = 1 << precision
+		self.registers = registers if registers is not None else np.zeros(self.num_registers, dtype=np.uint8)
+
+	def add_array(self, values: pa.Array):
+		"""Add the (distinct, non-null) values of an Arrow array, hashing them with numpy."""
+		if len(values) == 0:
+			return
+		hashes = _mix64(pd.util.hash_array(values.to_numpy(zero_copy_only=False)))
+		value_bits = 64 - self.precision
+		idx = (hashes >> np.uint64(value_bits)).astype(np.intp)
+		rest = hashes & np.uint64((1 << value_bits) - 1)
+		rank = (value_bits - _bit_length(rest) + 1).astype(np.uint8)
+		np.maximum.at(self.registers, idx, rank)
+
+	def merge(self, other: '_HyperLogLog'):
+		if other.precision != self.precision:
+			raise ValueError('Cannot merge sketches with different precision')
+		self.registers = np.maximum(self.registers, other.registers)
+
+	def estimate(self) -> int:
+		m = self.num_registers
+		alpha = 0.7213 / (1 + 1.079 / m)
+		raw = alpha * m * m / float(np.sum(np.exp2(-self.registers.astype(np.float64))))
+		zeros = int(np.count_nonzero(self.registers == 0))
+		if raw <= 2.5 * m and zeros:
+			raw = m * math.log(m / zeros)  # linear counting for small cardinalities
+		return int(round(raw))
+
+	def to_str(self) -> str:
+		return base64.b64encode(zlib.compress(self.registers.tobytes())).decode('ascii')
+
+	@classmethod
+	def from_str(cls, data: str, precision: int = 10) -> '_HyperLogLog':
+		registers = np.frombuffer(zlib.decompress(base64.b64decode(data)), dtype=np.uint8).copy()
+		return cls(precision, registers)
+
+
+def _mix64(x: np.ndarray) -> np.ndarray:
+	"""splitmix64 finalizer; spreads pandas hashes of small ints/epoch values over all 64 bits."""
+	with np.errstate(over='ignore'):
+		x = x + np.uint64(0x9E3779B97F4A7C15)
+		x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+		x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+		return x ^ (x >> np.uint64(31))
+
+
+def _bit_length(x: np.ndarray) -> np.ndarray:
+	"""Vectorised int.bit_length() for uint64 arrays."""
+	x = x.copy()
+	n = np.zeros(len(x), dtype=np.int64)
+	for shift in (32, 16, 8, 4, 2, 1):
+		mask = x >= np.uint64(1 << shift)
+		n[mask] += shift
+		x[mask] >>= np.uint64(shift)
+	return n + (x > 0)
+
+# ----------------------------------------------------------------------------
+# Per-file column statistics
+# ----------------------------------------------------------------------------
+
+def _to_json_value(value: Any) -> Any:
+	if isinstance(value, (datetime.datetime, datetime.date)):
+		return value.isoformat()
+	return value
+
+
+def _from_json_value(value: Any, arrow_type: str) -> Any:
+	"""Restore temporal stats/predicate values so they compare like with like."""
+	if value is None or not isinstance(value, str):
+		return value
+	if arrow_type.startswith('timestamp'):
+		return datetime.datetime.fromisoformat(value)
+	if arrow_type.startswith('date'):
+		return datetime.date.fromisoformat(value)
+	return value
+
+
+class ColumnStatsCollector:
+	"""Accumulate per-column statistics from each Arrow table as it is written."""
+
+	def __init__(self, schema: pa.Schema):
+		self.schema = schema
+		self.row_count = 0
+		self._stats = {
+			field.name: {'min': None, 'max': None, 'null_count': 0, 'sketch': _HyperLogLog()}
+			for field in schema
+		}
+
+	def update(self, table: pa.Table):
+		self.row_count += table.num_rows
+		for field in self.schema:
+			column = table.column(field.name)
+			stats = self._stats[field.name]
+			stats['null_count'] += column.null_count
+			if column.null_count == len(column):
+				continue
+			min_max = pc.min_max(column)
+			batch_min, batch_max = min_max['min'].as_py(), min_max['max'].as_py()
+			if stats['min'] is None or batch_min < stats['min']:
+				stats['min'] = batch_min
+			if stats['max'] is None or batch_max > stats['max']:
+				stats['max'] = batch_max
+			stats['sketch'].add_array(pc.unique(column.drop_null()))
+
+	def to_entry(self) -> Dict:
+		columns = {}
+		for field in self.schema:
+			stats = self._stats[field.name]
+			columns[field.name] = {
+				'type': str(field.type),
+				'min': _to_json_value(stats['min']),
+				'max': _to_json_value(stats['max']),
+				'null_count': stats['null_count'],
+				'distinct_count': stats['sketch'].estimate(),
+				'hll': stats['sketch'].to_str(),
+			}
+		return {
+			'row_count': self.row_count,
+			'written_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+			'columns': columns,
+		}
+
+# ----------------------------------------------------------------------------
+# Manifest persistence
+# ----------------------------------------------------------------------------
+
+def manifest_path(destination_path: str) -> str:
+	return f"{destination_path.rstrip('/')}/{MANIFEST_FILE_NAME}"
+
+
+def _stats_dir(destination_path: str) -> str:
+	return f"{destination_path.rstrip('/')}/{STATS_DIR_NAME}"
+
+
+def _atomic_write(fs: pafs.FileSystem, path: str, payload: bytes):
+	"""Write to a hidden temp file and rename it over ``path`` so readers never see a torn file."""
+	parent, name = path.rsplit('/', 1)
+	tmp_path = f"{parent}/_{name}.{uuid.uuid4().hex}.tmp"
+	with fs.open_output_stream(tmp_path) as out_stream:
+		out_stream.write(payload)
+	try:
+		fs.move(tmp_path, path)
+	except OSError:
+		# HDFS rename does not replace an existing file; a briefly missing
+		# manifest/sidecar only means the data file is not pruned
+		fs.delete_file(path)
+		fs.move(tmp_path, path)
+
+
+def _read_json(fs: pafs.FileSystem, path: str) -> Optional[Dict]:
+	"""Return the parsed file, or None when it is missing or unreadable."""
+	try:
+		with fs.open_input_stream(path) as in_stream:
+			return json.loads(in_stream.read().decode('utf-8'))
+	except FileNotFoundError:
+		return None
+	except ValueError as e:
+		logger.warning('Ignoring unreadable stats file %s: %s', path, e)
+		return None
+	except OSError as e:  # HadoopFileSystem reports missing paths as OSError
+		if fs.get_file_info(path).type == pafs.FileType.NotFound:
+			return None
+		raise e
+
+
+def _list_sidecars(fs: pafs.FileSystem, destination_path: str) -> List[pafs.FileInfo]:
+	selector = pafs.FileSelector(_stats_dir(destination_path), allow_not_found=True)
+	return [
+		info for info in fs.get_file_info(selector)
+		if info.type == pafs.FileType.File and info.base_name.endswith('.json') and not info.base_name.startswith('_')
+	]
+
+
+def read_manifest(fs: pafs.FileSystem, destination_path: str) -> Dict:
+	"""Return the compacted manifest overlaid with any per-file sidecars not yet compacted."""
+	manifest = _read_json(fs, manifest_path(destination_path)) or {}
+	files = manifest.get('files') if isinstance(manifest.get('files'), dict) else {}
+	for info in _list_sidecars(fs, destination_path):
+		entry = _read_json(fs, info.path)
+		if entry is not None:
+			files[info.base_name[:-len('.json')]] = entry
+	return {'version': MANIFEST_VERSION, 'files': files}
+
+
+def update_manifest(fs: pafs.FileSystem, destination_path: str, file_name: str, entry: Dict):
+	"""Write the stats entry for ``file_name`` as its own sidecar under ``_stats/``.
+
+	Each write touches one small file, so its cost does not grow with the
+	number of files. Sidecars are folded into ``_manifest.json`` once
+	``MANIFEST_COMPACT_THRESHOLD`` of them accumulate.
+	"""
+	stats_dir = _stats_dir(destination_path)
+	try:
+		fs.create_dir(stats_dir)
+	except Exception:
+		pass
+	_atomic_write(fs, f'{stats_dir}/{file_name}.json', json.dumps(entry, separators=(',', ':')).encode('utf-8'))
+	if len(_list_sidecars(fs, destination_path)) >= MANIFEST_COMPACT_THRESHOLD:
+		compact_manifest(fs, destination_path)
+
+
+def compact_manifest(fs: pafs.FileSystem, destination_path: str) -> int:
+	"""Fold sidecars into ``_manifest.json`` and drop entries of data files that no longer exist.
+
+	Returns the number of entries in the compacted manifest.
+	"""
+	sidecars = _list_sidecars(fs, destination_path)
+	manifest = read_manifest(fs, destination_path)
+	selector = pafs.FileSelector(destination_path.rstrip('/'), allow_not_found=True)
+	existing = {
+		info.base_name for info in fs.get_file_info(selector)
+		if info.type == pafs.FileType.File and info.base_name.endswith(DATA_FILE_SUFFIXES)
+	}
+	manifest['files'] = {name: entry for name, entry in manifest['files'].items() if name in existing}
+	path = manifest_path(destination_path)
+	_atomic_write(fs, path, json.dumps(manifest, separators=(',', ':')).encode('utf-8'))
+	for info in sidecars:
+		try:
+			fs.delete_file(info.path)
+		except OSError:  # pragma: no cover
+			pass
+	logger.info('Compacted manifest %s (%d files, %d sidecars folded)', path, len(manifest['files']), len(sidecars))
+	return len(manifest['files'])
+
+# ----------------------------------------------------------------------------
+# File skipping
+# ----------------------------------------------------------------------------
+
+def _column_may_match(stats: Dict, op: str, value: Any) -> bool:
+	arrow_type = stats.get('type', '')
+	has_values = stats.get('min') is not None
+	if op == 'is_null':
+		return stats.get('null_count', 0) > 0
+	if op == 'not_null':
+		return has_values
+	if not has_values:
+		return False  # all values null, no comparison can be true
+	col_min = _from_json_value(stats['min'], arrow_type)
+	col_max = _from_json_value(stats['max'], arrow_type)
+	if op == 'in':
+		values = [_from_json_value(_to_json_value(v), arrow_type) for v in value]
+		return any(col_min <= v <= col_max for v in values)
+	value = _from_json_value(_to_json_value(value), arrow_type)
+	if op in ('=', '=='):
+		return col_min <= value <= col_max
+	if op == '!=':
+		return not (col_min == col_max == value)
+	if op == '<':
+		return col_min < value
+	if op == '<=':
+		return col_min <= value
+	if op == '>':
+		return col_max > value
+	if op == '>=':
+		return col_max >= value
+	raise ValueError(f'Unsupported predicate operator: {op}')
+
+
+def file_may_match(entry: Dict, predicate: Sequence[Tuple[str, str, Any]]) -> bool:
+	"""Return False only when the stats prove no row of the file satisfies the predicate.
+
+	The predicate is a conjunction of ``(column, op, value)`` tuples, the same
+	shape as ``pyarrow.parquet`` filters. Ops: = == != < <= > >= in is_null not_null.
+	"""
+	columns = entry.get('columns', {})
+	for column, op, value in predicate:
+		stats = columns.get(column)
+		if stats is None:
+			continue  # no stats for this column, cannot rule the file out
+		try:
+			if not _column_may_match(stats, op, value):
+				return False
+		except TypeError:
+			continue  # incomparable predicate value, be conservative
+	return True
+
+
+def prune_files(
+	fs: pafs.FileSystem,
+	destination_path: str,
+	predicate: Sequence[Tuple[str, str, Any]],
+) -> List[str]:
+	"""List data files under ``destination_path`` that can match ``predicate``.
+
+	Files without a manifest entry are always returned so a missing or stale
+	manifest never hides data.
+	"""
+	manifest = read_manifest(fs, destination_path)
+	selector = pafs.FileSelector(destination_path.rstrip('/'), allow_not_found=True)
+	selected = []
+	for info in fs.get_file_info(selector):
+		if info.type != pafs.FileType.File or not info.base_name.endswith(DATA_FILE_SUFFIXES):
+			continue
+		entry = manifest['files'].get(info.base_name)
+		if entry is not None and entry.get('file_size') not in (None, info.size):
+			entry = None  # stats describe an older version of the file
+		if entry is None or file_may_match(entry, predicate):
+			selected.append(info.path)
+	logger.info('Pruned %s: %d file(s) can match %s', destination_path, len(selected), list(predicate))
+	return sorted(selected)
@@ -0,0 +1,226 @@
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+
+from src.config.config import HDFS_HOST, HDFS_PORT, QUERY_CACHE_MAX_BYTES
+from src.providers.hdfs_service import _open_hdfs
+from src.providers.manifest_service import DATA_FILE_SUFFIXES, prune_files
+from src.utils.common_util_func import build_filter_expression, build_schema, load_metadata
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s - %(message)s')
+
+SUPPORTED_AGGREGATIONS = ('sum', 'mean', 'min', 'max', 'count', 'count_distinct')
+
+# ----------------------------------------------------------------------------
+# Result cache
+# ----------------------------------------------------------------------------
+
+class QueryResultCache:
+	"""LRU cache of query results bounded by the Arrow buffer size of the cached tables.
+
+	Entries are keyed on a fingerprint of the files under the dataset location,
+	so newly landed (or rewritten) files change the key and old results are dropped.
+	"""
+
+	def __init__(self, max_bytes: int = QUERY_CACHE_MAX_BYTES):
+		self.max_bytes = max_bytes
+		self.current_bytes = 0
+		self.hits = 0
+		self.misses = 0
+		self._entries: 'OrderedDict[Tuple, pa.Table]' = OrderedDict()
+		self._fingerprints: Dict[Tuple[str, str], str] = {}
+		self._lock = threading.Lock()
+
+	def get(self, key: Tuple) -> Optional[pa.Table]:
+		with self._lock:
+			table = self._entries.get(key)
+			if table is None:
+				self.misses += 1
+				return None
+			self._entries.move_to_end(key)
+			self.hits += 1
+			return table
+
+	def put(self, key: Tuple, table: pa.Table):
+		size = table.nbytes
+		if size > self.max_bytes:
+			return
+		with self._lock:
+			if key in self._entries:
+				self.current_bytes -= self._entries.pop(key).nbytes
+			self._entries[key] = table
+			self.current_bytes += size
+			while self.current_bytes > self.max_bytes:
+				_, evicted = self._entries.popitem(last=False)
+				self.current_bytes -= evicted.nbytes
+
+	def register_fingerprint(self, dataset_key: Tuple[str, str], fingerprint: str):
+		"""Drop cached results of ``dataset_key`` once its file listing changes."""
+		with self._lock:
+			if self._fingerprints.get(dataset_key) == fingerprint:
+				return
+			self._fingerprints[dataset_key] = fingerprint
+			stale = [k for k in self._entries if k[:2] == dataset_key and k[2] != fingerprint]
+			for k in stale:
+				self.current_bytes -= self._entries.pop(k).nbytes
+			if stale:
+				logger.info('Invalidated %d cached result(s) for %s', len(stale), dataset_key)
+
+	def stats(self) -> Dict:
+		with self._lock:
+			return {
+				'entries': len(self._entries),
+				'bytes': self.current_bytes,
+				'max_bytes': self.max_bytes,
+				'hits': self.hits,
+				'misses': self.misses,
+			}
+
+
+_result_cache = QueryResultCache()
+
+# ----------------------------------------------------------------------------
+# Dataset resolution
+# ----------------------------------------------------------------------------
+
+def resolve_dataset(metadata: Dict, ocs_group: str, dataset: Optional[str] = None) -> Tuple[str, str, pa.schema]:
+	"""Return (dataset_name, destination_path, schema) for a dataset of an ocs group."""
+	for ds_cfg in metadata.get('dataset_config', []):
+		source = ds_cfg.get('source', {})
+		destination = ds_cfg.get('destination', {})
+		dataset_name = source.get('name', ocs_group)
+		if dataset is not None and dataset not in (dataset_name, destination.get('name')):
+			continue
+		# streaming consumers write to source.path, batch ingestion to destination.path
+		if metadata.get('source_type') == 'streaming':
+			dest_path = source.get('path')
+		else:
+			dest_path = destination.get('path')
+		if not dest_path:
+			raise ValueError(f'Destination path not specified in metadata for dataset {dataset_name}')
+		features = destination.get('features') or source.get('features', [])
+		return dataset_name, dest_path, build_schema(features)
+	raise ValueError(f'Dataset {dataset!r} not found in metadata for {ocs_group}')
+
+
+def _fingerprint_files(hdfs: pafs.FileSystem, dest_path: str) -> str:
+	selector = pafs.FileSelector(dest_path.rstrip('/'), allow_not_found=True)
+	digest = hashlib.sha1()
+	for info in sorted(hdfs.get_file_info(selector), key=lambda i: i.path):
+		if info.type == pafs.FileType.File and info.base_name.endswith(DATA_FILE_SUFFIXES):
+			digest.update(f'{info.path}|{info.size}|{info.mtime_ns}'.encode('utf-8'))
+	return digest.hexdigest()
+
+
+def _open_dataset(hdfs: pafs.FileSystem, files: List[str], schema: pa.schema) -> ds.Dataset:
+	children = []
+	for fmt, suffix in (('orc', '.orc'), ('parquet', '.parquet')):
+		fmt_files = [f for f in files if f.endswith(suffix)]
+		if fmt_files:
+			children.append(ds.dataset(fmt_files, schema=schema, format=fmt, filesystem=hdfs))
+	if len(children) == 1:
+		return children[0]
+	return ds.dataset(children, schema=schema)
+
+# ----------------------------------------------------------------------------
+# Query execution
+# ----------------------------------------------------------------------------
+
+def _execute(
+	dataset: ds.Dataset,
+	schema: pa.schema,
+	columns: Optional[Sequence[str]],
+	filters: Sequence[Tuple[str, str, Any]],
+	group_by: Sequence[str],
+	aggregations: Sequence[Tuple[str, str]],
+	limit: Optional[int],
+) -> pa.Table:
+	if aggregations:
+		projection = list(dict.fromkeys(list(group_by) + [col for col, _ in aggregations]))
+	else:
+		projection = list(columns) if columns else schema.names
+	for func in (func for _, func in aggregations):
+		if func not in SUPPORTED_AGGREGATIONS:
+			raise ValueError(f'Unsupported aggregation: {func}')
+	unknown = [c for c in projection if c not in schema.names]
+	if unknown:
+		raise ValueError(f'Unknown column(s): {unknown}')
+
+	scanner = dataset.scanner(columns=projection, filter=build_filter_expression(filters, schema))
+	if aggregations:
+		table = scanner.to_table().group_by(list(group_by)).aggregate(list(aggregations))
+	elif limit is not None:
+		return scanner.head(limit)
+	else:
+		table = scanner.to_table()
+	if limit is not None:
+		table = table.slice(0, limit)
+	return table
+
+
+def run_query(
+	ocs_group: str,
+	dataset: Optional[str] = None,
+	columns: Optional[Sequence[str]] = None,
+	filters: Optional[Sequence[Tuple[str, str, Any]]] = None,
+	group_by: Optional[Sequence[str]] = None,
+	aggregations: Optional[Sequence[Tuple[str, str]]] = None,
+	limit: Optional[int] = None,
+	use_cache: bool = True,
+	hdfs_host: str = HDFS_HOST,
+	hdfs_port: int = HDFS_PORT,
+) -> pa.Table:
+	"""Run a projection/filter/aggregate query over an ingested ocs group dataset.
+
+	Filters are (column, op, value) tuples; they prune files through the column
+	stats manifest and are pushed down into the Arrow scanner. Aggregations are
+	(column, func) pairs with func in ``SUPPORTED_AGGREGATIONS``.
+	"""
+	filters = [tuple(f) for f in filters or []]
+	group_by = list(group_by or [])
+	aggregations = [tuple(a) for a in aggregations or []]
+
+	metadata = load_metadata(ocs_group)
+	dataset_name, dest_path, schema = resolve_dataset(metadata, ocs_group, dataset)
+	hdfs = _open_hdfs(hdfs_host, hdfs_port)
+
+	fingerprint = _fingerprint_files(hdfs, dest_path)
+	dataset_key = (ocs_group, dataset_name)
+	cache_key = dataset_key + (fingerprint, json.dumps(
+		[list(columns or []), filters, group_by, aggregations, limit], default=str
+	))
+	if use_cache:
+		_result_cache.register_fingerprint(dataset_key, fingerprint)
+		cached = _result_cache.get(cache_key)
+		if cached is not None:
+			logger.info('Query cache hit for %s/%s', ocs_group, dataset_name)
+			return cached
+
+	files = prune_files(hdfs, dest_path, filters)
+	source = _open_dataset(hdfs, files, schema) if files else ds.dataset(schema.empty_table())
+	table = _execute(source, schema, columns, filters, group_by, aggregations, limit)
+	logger.info('Query on %s/%s returned %d row(s) from %d file(s)', ocs_group, dataset_name, table.num_rows, len(files))
+
+	if use_cache:
+		_result_cache.put(cache_key, table)
+	return table
+
+
+def table_to_ipc(table: pa.Table) -> bytes:
+	"""Serialize a result table as an Arrow IPC stream."""
+	sink = pa.BufferOutputStream()
+	with pa.ipc.new_stream(sink, table.schema) as writer:
+		writer.write_table(table)
+	return sink.getvalue().to_pybytes()
+
+
+def cache_stats() -> Dict:
+	return _result_cache.stats()
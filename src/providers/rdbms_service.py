@@ -1,6 +1,8 @@
 import logging
 import psycopg2
-from typing import Dict, Iterable, List, Sequence
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Sequence, Tuple
 import sys
 
 try:  # optional imports for postgres
@@ -84,6 +86,109 @@ def connect_db(source_cfg: Dict):
 	raise ValueError(f'Unsupported db_type: {db_type}')
 
 
+class ConnectionPool:
+	"""Keep idle DB connections per source so repeated jobs skip the connect handshake.
+
+	Connections are keyed by (db_type, host, port, database, user). ``acquire``
+	reuses an idle connection that still answers a liveness probe or opens a
+	new one; ``release`` rolls back any
+	open transaction and keeps up to ``max_idle`` connections per key.
+	"""
+
+	def __init__(self, max_idle: int = 2):
+		self.max_idle = max_idle
+		self._idle: Dict[Tuple, List] = {}
+		self._lock = threading.Lock()
+
+	@staticmethod
+	def _key(source_cfg: Dict) -> Tuple:
+		sec_cfg = source_cfg.get('sec_config', {}) or {}
+		return (
+			(source_cfg.get('db_type') or 'postgresql').lower(),
+			source_cfg.get('host'),
+			source_cfg.get('port'),
+			source_cfg.get('database'),
+			sec_cfg.get('user'),
+		)
+
+	@staticmethod
+	def _is_alive(conn, db_type: str) -> bool:
+		"""Probe an idle connection; server idle timeouts and firewalls drop them between jobs."""
+		try:
+			if getattr(conn, 'closed', False):  # psycopg2/pyodbc flag a connection known to be gone
+				return False
+			if db_type == 'mysql':
+				conn.ping(reconnect=False)
+				return True
+			cur = conn.cursor()
+			try:
+				cur.execute('SELECT 1')
+				cur.fetchall()
+			finally:
+				cur.close()
+			conn.rollback()  # do not leave the probe's transaction open
+			return True
+		except Exception:
+			return False
+
+	def acquire(self, source_cfg: Dict):
+		key = self._key(source_cfg)
+		while True:
+			with self._lock:
+				idle = self._idle.get(key)
+				pooled = idle.pop() if idle else None
+			if pooled is None:
+				break
+			conn, db_type = pooled
+			if self._is_alive(conn, db_type):
+				return pooled
+			logger.info('Dropping dead pooled %s connection to %s', db_type, source_cfg.get('host'))
+			try:
+				conn.close()
+			except Exception:  # pragma: no cover
+				pass
+		return connect_db(source_cfg)
+
+	def release(self, source_cfg: Dict, conn, db_type: str, discard: bool = False):
+		if not discard:
+			try:
+				conn.rollback()
+			except Exception:
+				discard = True  # connection is broken, do not hand it out again
+		key = self._key(source_cfg)
+		with self._lock:
+			idle = self._idle.setdefault(key, [])
+			if not discard and len(idle) < self.max_idle:
+				idle.append((conn, db_type))
+				return
+		try:
+			conn.close()
+		except Exception:  # pragma: no cover
+			pass
+
+	@contextmanager
+	def connection(self, source_cfg: Dict):
+		conn, db_type = self.acquire(source_cfg)
+		failed = False
+		try:
+			yield conn, db_type
+		except Exception:
+			failed = True
+			raise
+		finally:
+			self.release(source_cfg, conn, db_type, discard=failed)
+
+	def close_all(self):
+		with self._lock:
+			idle, self._idle = self._idle, {}
+		for conns in idle.values():
+			for conn, _ in conns:
+				try:
+					conn.close()
+				except Exception:  # pragma: no cover
+					pass
+
+
 def _quote_identifier(col: str, db_type: str) -> str:
 	if db_type == 'postgresql':
 		return f'"{col}"'
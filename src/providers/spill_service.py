@@ -0,0 +1,174 @@
+import fcntl
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import pyarrow as pa
+
+from src.config.config import SPILL_DIR, SPILL_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s - %(message)s')
+
+SPILL_FILE_SUFFIX = '.arrow'
+SPILL_LOCK_FILE = '.lock'
+
+# ----------------------------------------------------------------------------
+# Local write-ahead spill (Arrow IPC files)
+# ----------------------------------------------------------------------------
+
+class SpillCapacityError(RuntimeError):
+	"""Raised when the spill directory has reached its byte cap."""
+
+
+class SpillBuffer:
+	"""Durable local queue of Arrow tables, one IPC file per appended batch.
+
+	Segments are written to a temporary name, fsynced and renamed, so a file
+	with the final suffix is always complete. Segment names end with the
+	append timestamp, which is the order the uploader replays them in.
+
+	A buffer holds an exclusive lock on its directory for its lifetime, so two
+	consumers can never replay (or clean up) each other's segments; give each
+	consumer its own directory and call ``close`` when done.
+	"""
+
+	def __init__(self, spill_dir: str = SPILL_DIR, max_bytes: int = SPILL_MAX_BYTES):
+		self.spill_dir = spill_dir
+		self.max_bytes = max_bytes
+		self.segments_spilled = 0
+		self.segments_uploaded = 0
+		self._lock = threading.Lock()
+		os.makedirs(spill_dir, exist_ok=True)
+		self._lock_file = open(os.path.join(spill_dir, SPILL_LOCK_FILE), 'w')
+		try:
+			fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+		except BlockingIOError:
+			self._lock_file.close()
+			raise RuntimeError(f'Spill directory {spill_dir} is in use by another process')
+		for name in os.listdir(spill_dir):
+			if name.endswith('.tmp'):  # torn write from a previous crash, never acknowledged
+				os.remove(os.path.join(spill_dir, name))
+		self._disk_usage = sum(os.path.getsize(p) for p in self.pending())
+		if self._disk_usage:
+			logger.info('Found %d spilled segment(s) (%d bytes) to replay in %s', len(self.pending()), self._disk_usage, spill_dir)
+
+	@property
+	def disk_usage_bytes(self) -> int:
+		return self._disk_usage
+
+	def append(self, table: pa.Table, name_prefix: str = 'segment') -> str:
+		"""Durably persist ``table`` and return the segment path."""
+		if self._disk_usage >= self.max_bytes:
+			raise SpillCapacityError(
+				f'Spill directory {self.spill_dir} is full ({self._disk_usage}/{self.max_bytes} bytes)'
+			)
+		name = f"{name_prefix}_{time.time_ns():020d}"
+		final_path = os.path.join(self.spill_dir, name + SPILL_FILE_SUFFIX)
+		tmp_path = final_path + '.tmp'
+		with pa.OSFile(tmp_path, 'wb') as sink:
+			with pa.ipc.new_file(sink, table.schema) as writer:
+				writer.write_table(table)
+		with open(tmp_path, 'rb') as f:
+			os.fsync(f.fileno())
+		os.replace(tmp_path, final_path)
+		with self._lock:
+			self._disk_usage += os.path.getsize(final_path)
+			self.segments_spilled += 1
+		return final_path
+
+	def pending(self) -> List[str]:
+		names = sorted(
+			(n for n in os.listdir(self.spill_dir) if n.endswith(SPILL_FILE_SUFFIX)),
+			key=lambda n: n[:-len(SPILL_FILE_SUFFIX)].rsplit('_', 1)[-1],  # append timestamp
+		)
+		return [os.path.join(self.spill_dir, n) for n in names]
+
+	def read(self, path: str) -> pa.Table:
+		"""Replay a segment through a memory map, without copying it onto the heap."""
+		with pa.memory_map(path, 'r') as source:
+			return pa.ipc.open_file(source).read_all()
+
+	def remove(self, path: str):
+		size = os.path.getsize(path)
+		os.remove(path)
+		with self._lock:
+			self._disk_usage -= size
+			self.segments_uploaded += 1
+
+	def close(self):
+		"""Release the directory lock; pending segments stay on disk for the next run."""
+		if not self._lock_file.closed:
+			fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+			self._lock_file.close()
+
+	def metrics(self) -> Dict:
+		return {
+			'spill_disk_usage_bytes': self._disk_usage,
+			'spill_max_bytes': self.max_bytes,
+			'spill_pending_segments': len(self.pending()),
+			'spill_segments_spilled': self.segments_spilled,
+			'spill_segments_uploaded': self.segments_uploaded,
+		}
+
+# ----------------------------------------------------------------------------
+# Background uploader
+# ----------------------------------------------------------------------------
+
+class SpillUploader(threading.Thread):
+	"""Drain spilled segments to their sink, retrying with exponential backoff.
+
+	``upload`` receives the replayed table and the segment name (used as the
+	output file name so a retried upload overwrites, rather than duplicates,
+	a partially written file). A segment is deleted only after it succeeds.
+	"""
+
+	def __init__(
+		self,
+		spill: SpillBuffer,
+		upload: Callable[[pa.Table, str], None],
+		poll_interval: float = 1.0,
+		initial_backoff: float = 1.0,
+		max_backoff: float = 60.0,
+	):
+		super().__init__(name='spill-uploader', daemon=True)
+		self.spill = spill
+		self.upload = upload
+		self.poll_interval = poll_interval
+		self.initial_backoff = initial_backoff
+		self.max_backoff = max_backoff
+		self.consecutive_failures = 0
+		self._stop_event = threading.Event()
+
+	def drain_once(self) -> bool:
+		"""Upload pending segments in order; return False on the first failure."""
+		for path in self.spill.pending():
+			segment_name = os.path.basename(path)[:-len(SPILL_FILE_SUFFIX)]
+			try:
+				self.upload(self.spill.read(path), segment_name)
+			except Exception as e:
+				self.consecutive_failures += 1
+				logger.warning('Upload of spilled segment %s failed (attempt %d): %s', segment_name, self.consecutive_failures, e)
+				return False
+			self.spill.remove(path)
+			self.consecutive_failures = 0
+		return True
+
+	def run(self):
+		while not self._stop_event.is_set():
+			if self.drain_once():
+				delay = self.poll_interval
+			else:
+				delay = min(self.max_backoff, self.initial_backoff * 2 ** (self.consecutive_failures - 1))
+			self._stop_event.wait(delay)
+
+	def stop(self, drain_timeout: Optional[float] = 30.0):
+		"""Stop the loop, then make one last drain attempt; leftovers are replayed on restart."""
+		self._stop_event.set()
+		self.join(drain_timeout)
+		if self.is_alive():  # an upload is still in flight, do not race it
+			return
+		if not self.drain_once():
+			logger.warning('%d spilled segment(s) left in %s for the next run', len(self.spill.pending()), self.spill.spill_dir)
@@ -0,0 +1,62 @@
+import logging
+from typing import Any, List, Optional, Tuple
+
+import pyarrow as pa
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+from src.providers.query_service import cache_stats, run_query, table_to_ipc
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+app = FastAPI()
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+class QueryRequest(BaseModel):
+    dataset: Optional[str] = None
+    columns: Optional[List[str]] = None
+    filters: List[Tuple[str, str, Any]] = []
+    group_by: List[str] = []
+    aggregations: List[Tuple[str, str]] = []
+    limit: Optional[int] = None
+
+
+@app.post("/query/{ocs_group}")
+def query_endpoint(
+    ocs_group: str,
+    request: QueryRequest,
+    format: str = Query("json", pattern="^(json|arrow)$")
+):
+    try:
+        table = run_query(
+            ocs_group,
+            dataset=request.dataset,
+            columns=request.columns,
+            filters=request.filters,
+            group_by=request.group_by,
+            aggregations=request.aggregations,
+            limit=request.limit,
+        )
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (ValueError, TypeError, pa.ArrowException) as e:
+        # bad column types, aggregations or filter literals raise from Arrow compute
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if format == "arrow":
+        return Response(content=table_to_ipc(table), media_type=ARROW_STREAM_MEDIA_TYPE)
+    return JSONResponse(content={
+        "num_rows": table.num_rows,
+        "columns": table.schema.names,
+        "rows": jsonable_encoder(table.to_pylist()),
+    })
+
+
+@app.get("/query/cache/stats")
+def query_cache_stats():
+    return cache_stats()
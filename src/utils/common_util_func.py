@@ -1,9 +1,10 @@
 import pyarrow as pa
+import pyarrow.dataset as ds
 import pyarrow.parquet as pq
 import pyarrow.fs as pafs
 import os
 import json
-from typing import Dict, Iterable, List, Sequence
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 # ----------------------------------------------------------------------------
 # Schema & Type Utilities
 # ----------------------------------------------------------------------------
@@ -31,6 +32,57 @@ def build_schema(features: Sequence[Dict]) -> pa.schema:
 		fields.append(pa.field(name, pa_type))
 	return pa.schema(fields)
 
+#-------------------------------------------------------------------------------
+# Predicate Utilities
+#-------------------------------------------------------------------------------
+
+def _coerce_filter_value(value: Any, pa_type: Optional[pa.DataType]) -> Any:
+	"""Cast string literals to temporal column types so comparisons type-check."""
+	if pa_type is None or not isinstance(value, str):
+		return value
+	if pa.types.is_timestamp(pa_type) or pa.types.is_date(pa_type):
+		return pa.scalar(value).cast(pa_type)
+	return value
+
+
+def build_filter_expression(
+	predicate: Sequence[Tuple[str, str, Any]],
+	schema: Optional[pa.schema] = None,
+) -> Optional[ds.Expression]:
+	"""Turn a conjunction of (column, op, value) tuples into an Arrow dataset filter.
+
+	Uses the same predicate shape as ``manifest_service.prune_files`` so one
+	filter drives both file skipping and row-level pushdown.
+	"""
+	expression = None
+	for column, op, value in predicate or []:
+		field = ds.field(column)
+		pa_type = schema.field(column).type if schema is not None and column in schema.names else None
+		if op == 'is_null':
+			term = field.is_null()
+		elif op == 'not_null':
+			term = field.is_valid()
+		elif op == 'in':
+			term = field.isin([_coerce_filter_value(v, pa_type) for v in value])
+		else:
+			value = _coerce_filter_value(value, pa_type)
+			if op in ('=', '=='):
+				term = field == value
+			elif op == '!=':
+				term = field != value
+			elif op == '<':
+				term = field < value
+			elif op == '<=':
+				term = field <= value
+			elif op == '>':
+				term = field > value
+			elif op == '>=':
+				term = field >= value
+			else:
+				raise ValueError(f'Unsupported predicate operator: {op}')
+		expression = term if expression is None else expression & term
+	return expression
+
 #-------------------------------------------------------------------------------
 # Read metadata config
 #-------------------------------------------------------------------------------